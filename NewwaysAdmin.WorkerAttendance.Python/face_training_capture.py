@@ -1,25 +1,79 @@
 # File: face_training_capture.py
 # Purpose: Face training with unified JSON communication (same as unified_video_detection.py)
+# GPU: with a CUDA build of dlib the CNN face detector is used instead of HOG, e.g.
+#      python setup.py install --set DLIB_USE_CUDA=1 --set USE_AVX_INSTRUCTIONS=1
 
 import cv2
 import sys
 import base64
-import json
 import time
-import face_recognition
 import numpy as np
 import threading
+import queue
+
+# Shared with unified_video_detection.py - deployed next to both scripts
+from video_common import TextSprite, open_camera, put_latest, write_frame, write_message
+
+def _lazy_fr():
+    """Import face_recognition on first use - loading its dlib models is the slowest part of startup"""
+    import face_recognition
+    return face_recognition
+
+def _use_cnn_detector():
+    """CUDA dlib runs the CNN detector on the GPU; CPU-only builds stay on HOG (imports dlib, so call lazily)"""
+    import dlib
+    return bool(getattr(dlib, "DLIB_USE_CUDA", False))
 
 class FaceTrainingCapture:
     def __init__(self):
         self.camera = None
         self.is_running = False
         
+        # Preview JPEG settings - encoded straight from the BGR frame (libjpeg-turbo in opencv-python)
+        # Quality drops while finished frames are still waiting in _write_q (C# slow to drain stdout)
+        self.jpeg_quality_by_backlog = (85, 60, 40)
+        self.jpeg_params_by_backlog = [[int(cv2.IMWRITE_JPEG_QUALITY), quality, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+                                       for quality in self.jpeg_quality_by_backlog]
+        
+        # Face detection runs on a downscaled copy - boxes are scaled back to full resolution.
+        # The model is picked on the first CAPTURE (see configure_detector) so startup never loads dlib
+        self.detection_model = None
+        self.detection_scale = None
+        self.detection_upsample = None
+        
+        # Preview overlay uses the cheap Haar cascade on grayscale - dlib only runs on CAPTURE
+        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        
+        # Face size range in front of the camera - the cascade skips pyramid levels outside it
+        self.min_face_size = (96, 96)
+        self.max_face_size = (400, 400)
+        
+        # Preview overlay only re-detects every Nth frame, boxes are reused in between
+        self.detection_interval = 4
+        self._frame_idx = 0
+        self._cached_faces = []
+        
+        # Constant labels are pre-rendered, only the face count goes through putText
+        self._face_ready_text = TextSprite("Face Ready for Training", 0.7, (0, 255, 0))
+        self._training_mode_text = TextSprite("TRAINING MODE - Click CAPTURE when ready", 0.6, (255, 255, 255))
+        
+        # Pipeline: camera thread -> overlay thread -> writer (main loop), bounded for back-pressure
+        self._read_q = queue.Queue(maxsize=2)
+        self._write_q = queue.Queue(maxsize=2)
+        self._latest_frame = None  # Raw camera frame for CAPTURE (camera is only read by its own thread)
+        self._frame_lock = threading.Lock()
+        self._camera_thread = None
+        self._overlay_thread = None
+        
+        # Reused cvtColor outputs, one per thread that converts (overlay -> gray, CAPTURE -> rgb).
+        # The flipped preview frame is not reused - it is still queued while the next one is read.
+        # (cvtColor's SIMD channel swap is far faster than np.ascontiguousarray(frame[..., ::-1]))
+        self._gray = None
+        self._rgb = None
+        
     def send_message(self, msg_type, **kwargs):
         """Send JSON message to C# - SAME FORMAT as unified_video_detection.py"""
-        message = {"type": msg_type, "timestamp": time.time(), **kwargs}
-        print(json.dumps(message))
-        sys.stdout.flush()
+        write_message(msg_type, **kwargs)
         
     def start_training(self):
         """Initialize camera and start training session"""
@@ -27,14 +81,12 @@ class FaceTrainingCapture:
             self.send_message("status", message="Initializing camera for face training...")
             
             # Initialize camera
-            self.camera = cv2.VideoCapture(0)
+            self.camera = open_camera()
             if not self.camera.isOpened():
                 self.send_message("error", message="Cannot access camera")
                 return False
                 
-            # Set camera properties for better quality
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # open_camera requests 640x480 MJPG
             self.camera.set(cv2.CAP_PROP_FPS, 30)
             
             self.is_running = True
@@ -45,43 +97,86 @@ class FaceTrainingCapture:
             self.send_message("error", message=f"Failed to initialize camera: {str(e)}")
             return False
     
-    def capture_frame(self):
-        """Capture and return current video frame"""
-        if not self.camera:
-            return None
+    def camera_loop(self):
+        """Pipeline stage 1: read frames - the only thread that touches the VideoCapture"""
+        while self.is_running:
+            ret, frame = self.camera.read()
+            if not ret:
+                self.send_message("error", message="Failed to capture frame")
+                time.sleep(0.1)
+                continue
             
-        ret, frame = self.camera.read()
-        if not ret:
-            self.send_message("error", message="Failed to capture frame")
-            return None
+            with self._frame_lock:
+                self._latest_frame = frame
+            
+            # Flip frame horizontally for mirror effect
+            put_latest(self._read_q, cv2.flip(frame, 1))
+    
+    def overlay_loop(self):
+        """Pipeline stage 2: face detection overlay"""
+        while self.is_running:
+            try:
+                frame = self._read_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            frame_with_overlay = self.add_face_detection_overlay(frame)
             
-        # Flip frame horizontally for mirror effect
-        frame = cv2.flip(frame, 1)
+            # Blocking put - a slow writer holds this stage back instead of piling up frames
+            while self.is_running:
+                try:
+                    self._write_q.put(frame_with_overlay, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+    
+    def configure_detector(self):
+        """Pick the dlib detector on first use - CNN on CUDA builds, HOG otherwise"""
+        # CNN without upsampling at 1/2 finds the same minimum face size as HOG with one upsample at 1/4
+        if _use_cnn_detector():
+            self.detection_model = "cnn"
+            self.detection_scale = 2
+            self.detection_upsample = 0
+        else:
+            self.detection_model = "hog"
+            self.detection_scale = 4
+            self.detection_upsample = 1
+        self.send_message("status", message=f"Using {self.detection_model.upper()} face detector")
+    
+    def detect_face_locations(self, rgb_frame):
+        """Detect faces on a downscaled copy, return (top, right, bottom, left) in full-frame coords"""
+        if self.detection_model is None:
+            self.configure_detector()
+        scale = self.detection_scale
+        small_frame = cv2.resize(rgb_frame, (0, 0), fx=1.0 / scale, fy=1.0 / scale)
         
-        # Draw face detection overlay
-        frame_with_overlay = self.add_face_detection_overlay(frame)
+        locations = _lazy_fr().face_locations(small_frame,
+                                              number_of_times_to_upsample=self.detection_upsample,
+                                              model=self.detection_model)
         
-        return frame_with_overlay
+        return [(top * scale, right * scale, bottom * scale, left * scale)
+                for (top, right, bottom, left) in locations]
     
     def add_face_detection_overlay(self, frame):
         """Add face detection overlay to frame"""
         try:
-            # Convert BGR to RGB for face_recognition
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Find face locations
-            face_locations = face_recognition.face_locations(rgb_frame)
+            # Find faces with the Haar cascade (cached between detection frames)
+            if self._frame_idx % self.detection_interval == 0:
+                gray = self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+                self._cached_faces = self.face_cascade.detectMultiScale(gray, 1.3, 5,
+                                                                        minSize=self.min_face_size,
+                                                                        maxSize=self.max_face_size)
+            self._frame_idx += 1
+            faces = self._cached_faces
             
             # Draw rectangles around detected faces
-            for (top, right, bottom, left) in face_locations:
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                cv2.putText(frame, "Face Ready for Training", (left, top-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
+                self._face_ready_text.draw(frame, (x, y-10))
             
             # Add training instructions overlay
-            cv2.putText(frame, "TRAINING MODE - Click CAPTURE when ready", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(frame, f"Faces detected: {len(face_locations)}", (10, 60), 
+            self._training_mode_text.draw(frame, (10, 30))
+            cv2.putText(frame, f"Faces detected: {len(faces)}", (10, 60), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             
             return frame
@@ -90,14 +185,17 @@ class FaceTrainingCapture:
             self.send_message("error", message=f"Error in face detection: {str(e)}")
             return frame
     
-    def send_frame(self, frame):
-        """Send video frame to C# as base64 JSON message"""
+    def send_frame(self, frame, backlog=0):
+        """Send video frame to C# as a JSON header line followed by the raw JPEG bytes"""
         try:
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
+            params = self.jpeg_params_by_backlog[min(backlog, len(self.jpeg_params_by_backlog) - 1)]
+            ok, buffer = cv2.imencode('.jpg', frame, params)
+            if not ok:
+                self.send_message("error", message="JPEG encode failed")
+                return
             
             # Send frame using same format as unified_video_detection.py
-            self.send_message("frame", data=frame_base64)
+            write_frame(buffer)
             
         except Exception as e:
             self.send_message("error", message=f"Error encoding frame: {str(e)}")
@@ -109,18 +207,19 @@ class FaceTrainingCapture:
                 self.send_message("error", message="Camera not initialized")
                 return None
                 
-            # Capture frame
-            ret, frame = self.camera.read()
-            if not ret:
+            # Use the newest frame from the camera thread
+            with self._frame_lock:
+                frame = self._latest_frame
+            if frame is None:
                 self.send_message("error", message="Failed to capture frame for encoding")
                 return None
             
             # Convert to RGB for face_recognition
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            rgb_frame = self._rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
             
-            # Get face encodings
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+            # Detect on the small frame, encode on the full-resolution frame for accuracy
+            face_locations = self.detect_face_locations(rgb_frame)
+            face_encodings = _lazy_fr().face_encodings(rgb_frame, face_locations)
             
             if not face_encodings:
                 self.send_message("error", message="No face found for encoding")
@@ -163,17 +262,23 @@ class FaceTrainingCapture:
         command_thread = threading.Thread(target=self.read_commands, daemon=True)
         command_thread.start()
         
+        # Start capture and overlay pipeline stages
+        self._camera_thread = threading.Thread(target=self.camera_loop, daemon=True)
+        self._overlay_thread = threading.Thread(target=self.overlay_loop, daemon=True)
+        self._camera_thread.start()
+        self._overlay_thread.start()
+        
         self.send_message("status", message="Training loop started - ready for commands")
             
         try:
+            # Pipeline stage 3: encode and send finished frames
             while self.is_running:
-                # Capture and send video frame
-                frame = self.capture_frame()
-                if frame is not None:
-                    self.send_frame(frame)
-                
-                # Small delay to prevent overwhelming the system
-                time.sleep(0.1)  # 10 FPS
+                try:
+                    frame = self._write_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                # No fixed delay - the camera thread's blocking read paces the pipeline
+                self.send_frame(frame, self._write_q.qsize())
                 
         except Exception as e:
             self.send_message("error", message=f"Training loop error: {str(e)}")
@@ -197,6 +302,14 @@ class FaceTrainingCapture:
     
     def cleanup(self):
         """Clean up resources"""
+        self.is_running = False
+        
+        # Let the camera thread finish its current read before releasing the device
+        if self._camera_thread:
+            self._camera_thread.join(timeout=2.0)
+        if self._overlay_thread:
+            self._overlay_thread.join(timeout=1.0)
+        
         if self.camera:
             self.camera.release()
         cv2.destroyAllWindows()
@@ -209,8 +322,7 @@ def main():
         trainer.run_training_loop()
     except Exception as e:
         # Send error in JSON format
-        error_msg = {"type": "error", "message": f"Fatal error: {str(e)}", "timestamp": time.time()}
-        print(json.dumps(error_msg))
+        write_message("error", message=f"Fatal error: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+# File: video_common.py
+# Purpose: Helpers shared by unified_video_detection.py and face_training_capture.py
+#          (stdout protocol to C#, camera setup, frame queues, overlay text)
+# DEPLOYMENT: linked into the UI project's Python folder, so it is copied next to both scripts
+
+import cv2
+import json
+import sys
+import time
+import threading
+import queue
+import numpy as np
+
+# Optional: orjson (pip install orjson) serializes control messages in C, straight to UTF-8 bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Messages and frames come from several threads - each one must reach stdout whole
+_stdout_lock = threading.Lock()
+
+def dump_message(message):
+    """Serialize one message as a UTF-8 JSON line"""
+    if orjson is not None:
+        return orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(message).encode('utf-8') + b'\n'
+
+def write_message(msg_type, **kwargs):
+    """Send JSON message to C#"""
+    message = {"type": msg_type, "timestamp": time.time(), **kwargs}
+    data = dump_message(message)
+    with _stdout_lock:
+        # One write of the finished line - no text-layer encode, same stream as the binary frames
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+def write_frame(buffer):
+    """Send an encoded JPEG to C# as a JSON header line followed by the raw bytes"""
+    # Hot path: header line with the payload length, then the JPEG bytes as-is (no base64)
+    with _stdout_lock:
+        out = sys.stdout.buffer
+        out.write(b'{"type": "frame", "timestamp": %.6f, "length": %d}\n' % (time.time(), len(buffer)))
+        out.write(buffer)
+        out.flush()
+
+def put_latest(frame_queue, item):
+    """Queue an item, dropping the oldest one when the consumer is behind"""
+    try:
+        frame_queue.put_nowait(item)
+    except queue.Full:
+        try:
+            frame_queue.get_nowait()
+        except queue.Empty:
+            pass
+        frame_queue.put_nowait(item)
+
+def open_camera(width=640, height=480):
+    """Open the default camera on the platform's native backend, requesting MJPG frames"""
+    # The default Windows backend (MSMF) delivers raw YUY2 - DirectShow/V4L2 honour the MJPG fourcc
+    if sys.platform == "win32":
+        backend = cv2.CAP_DSHOW
+    elif sys.platform.startswith("linux"):
+        backend = cv2.CAP_V4L2
+    else:
+        backend = cv2.CAP_ANY
+
+    camera = cv2.VideoCapture(0, backend)
+    if not camera.isOpened():
+        camera = cv2.VideoCapture(0)  # Fall back to the default backend
+
+    # The camera compresses in hardware (half the USB bandwidth), OpenCV decodes with libjpeg-turbo
+    camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    # VGA is all either script uses - don't pull the sensor's full resolution
+    camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    # Keep only the newest frame in the driver queue - a stalled reader resumes on a fresh frame, not a stale one
+    camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return camera
+
+class TextSprite:
+    """Constant overlay text rendered once - drawing it is a masked copy instead of a putText call"""
+    def __init__(self, text, font_scale, color, thickness=2, font=cv2.FONT_HERSHEY_SIMPLEX):
+        self.text = text
+        self.font = font
+        self.font_scale = font_scale
+        self.color = color
+        self.thickness = thickness
+
+        (width, height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        self.pad = thickness
+        self.ascent = height
+        sprite_size = (height + baseline + 2 * self.pad, width + 2 * self.pad)
+
+        self.image = np.zeros(sprite_size + (3,), np.uint8)
+        self.mask = np.zeros(sprite_size, np.uint8)
+        origin = (self.pad, self.pad + height)
+        cv2.putText(self.image, text, origin, font, font_scale, color, thickness)
+        cv2.putText(self.mask, text, origin, font, font_scale, 255, thickness)
+
+    def draw(self, frame, org):
+        """Same pixels as cv2.putText(frame, text, org, ...) - falls back to it when clipped by the frame edge"""
+        top = org[1] - self.ascent - self.pad
+        left = org[0] - self.pad
+        height, width = self.mask.shape
+        if top < 0 or left < 0 or top + height > frame.shape[0] or left + width > frame.shape[1]:
+            cv2.putText(frame, self.text, org, self.font, self.font_scale, self.color, self.thickness)
+            return
+        cv2.copyTo(self.image, self.mask, frame[top:top + height, left:left + width])
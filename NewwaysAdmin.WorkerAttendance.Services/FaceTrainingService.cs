@@ -153,11 +153,12 @@ namespace NewwaysAdmin.WorkerAttendance.Services
                     {
                         if (!_trainingProcess.HasExited)
                         {
-                            bool exited = _trainingProcess.WaitForExit(2000); // 2 second timeout
+                            bool exited = await _trainingProcess.TryWaitForExitAsync(2000); // 2 second timeout
                             if (!exited)
                             {
                                 _logger.LogWarning("Training process did not exit gracefully, will be terminated");
                                 _trainingProcess.Kill();
+                                await _trainingProcess.TryWaitForExitAsync(2000);
                             }
                         }
                     }
@@ -202,16 +203,20 @@ namespace NewwaysAdmin.WorkerAttendance.Services
                 // Store a local reference to avoid null reference issues
                 var process = _trainingProcess;
 
+                // Raw stream: frame payloads are binary JPEG bytes following their JSON header line
+                var reader = new PythonMessageReader(process.StandardOutput.BaseStream);
+
                 while (process != null && !process.HasExited && _isRunning)
                 {
                     // Double-check process is still valid
                     if (process.StandardOutput == null)
                         break;
 
-                    var line = await process.StandardOutput.ReadLineAsync();
+                    var line = await reader.ReadLineAsync();
                     _logger.LogInformation("Raw Python output: '{Line}'", line ?? "NULL");
 
-                    if (string.IsNullOrEmpty(line)) continue;
+                    if (line == null) break;
+                    if (line.Length == 0) continue;
 
                     try
                     {
@@ -224,7 +229,12 @@ namespace NewwaysAdmin.WorkerAttendance.Services
                         switch (message.Type)
                         {
                             case "frame":
-                                if (!string.IsNullOrEmpty(message.Data))
+                                if (message.Length > 0)
+                                {
+                                    byte[] frameBytes = await reader.ReadBytesAsync(message.Length);
+                                    FrameReceived?.Invoke(frameBytes);
+                                }
+                                else if (!string.IsNullOrEmpty(message.Data))
                                 {
                                     byte[] frameBytes = Convert.FromBase64String(message.Data);
                                     FrameReceived?.Invoke(frameBytes);
@@ -278,6 +288,7 @@ namespace NewwaysAdmin.WorkerAttendance.Services
             public string? Data { get; set; }
             public string? Message { get; set; }
             public double Timestamp { get; set; }
+            public int Length { get; set; } // Raw payload bytes following this line (binary frames)
         }
 
         /// <summary>
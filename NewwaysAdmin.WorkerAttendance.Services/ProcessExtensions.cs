@@ -0,0 +1,27 @@
+﻿// File: NewwaysAdmin.WorkerAttendance.Services/ProcessExtensions.cs
+// Purpose: Bounded, non-blocking waits on the Python child processes
+
+using System.Diagnostics;
+
+namespace NewwaysAdmin.WorkerAttendance.Services
+{
+    public static class ProcessExtensions
+    {
+        /// <summary>
+        /// Wait asynchronously for the process to exit, returns false if it is still running after timeoutMs
+        /// </summary>
+        public static async Task<bool> TryWaitForExitAsync(this Process process, int timeoutMs)
+        {
+            using var timeout = new CancellationTokenSource(timeoutMs);
+            try
+            {
+                await process.WaitForExitAsync(timeout.Token);
+                return true;
+            }
+            catch (OperationCanceledException)
+            {
+                return false;
+            }
+        }
+    }
+}
@@ -0,0 +1,84 @@
+﻿// File: NewwaysAdmin.WorkerAttendance.Services/PythonMessageReader.cs
+// Purpose: Reads stdout of the Python face scripts - one JSON message per line, where a
+//          "frame" message carrying a "length" is followed by that many raw JPEG bytes
+
+using System.Text;
+
+namespace NewwaysAdmin.WorkerAttendance.Services
+{
+    public class PythonMessageReader
+    {
+        private readonly Stream _stream;
+        private readonly byte[] _buffer = new byte[64 * 1024];
+        private readonly MemoryStream _line = new MemoryStream();
+        private int _start;
+        private int _end;
+
+        public PythonMessageReader(Stream stream)
+        {
+            _stream = stream;
+        }
+
+        /// <summary>
+        /// Read the next text line (without line ending), or null at end of stream
+        /// </summary>
+        public async Task<string?> ReadLineAsync()
+        {
+            _line.SetLength(0);
+
+            while (true)
+            {
+                if (_start == _end && !await FillBufferAsync())
+                {
+                    return _line.Length > 0 ? DecodeLine() : null;
+                }
+
+                int newline = Array.IndexOf(_buffer, (byte)'\n', _start, _end - _start);
+                if (newline >= 0)
+                {
+                    _line.Write(_buffer, _start, newline - _start);
+                    _start = newline + 1;
+                    return DecodeLine();
+                }
+
+                _line.Write(_buffer, _start, _end - _start);
+                _start = _end;
+            }
+        }
+
+        /// <summary>
+        /// Read exactly count raw bytes (binary payload following a header line)
+        /// </summary>
+        public async Task<byte[]> ReadBytesAsync(int count)
+        {
+            var result = new byte[count];
+
+            int copied = Math.Min(count, _end - _start);
+            Buffer.BlockCopy(_buffer, _start, result, 0, copied);
+            _start += copied;
+
+            while (copied < count)
+            {
+                int read = await _stream.ReadAsync(result, copied, count - copied);
+                if (read == 0)
+                    throw new EndOfStreamException($"Python output ended {count - copied} bytes into a {count} byte payload");
+                copied += read;
+            }
+
+            return result;
+        }
+
+        private async Task<bool> FillBufferAsync()
+        {
+            _start = 0;
+            _end = await _stream.ReadAsync(_buffer, 0, _buffer.Length);
+            return _end > 0;
+        }
+
+        private string DecodeLine()
+        {
+            // Python on Windows may write \r\n line endings
+            return Encoding.UTF8.GetString(_line.GetBuffer(), 0, (int)_line.Length).TrimEnd('\r');
+        }
+    }
+}
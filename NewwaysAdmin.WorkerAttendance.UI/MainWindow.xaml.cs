@@ -314,13 +314,10 @@ namespace NewwaysAdmin.WorkerAttendance.UI
                 return;
             }
 
-            // Stop the normal video feed
-            _videoService.StopVideoFeed();
+            // Stop the normal video feed (returns once the Python process has exited)
+            await _videoService.StopVideoFeedAsync();
             UpdateStatus("Normal video feed stopped");
 
-            // Wait for cleanup
-            await Task.Delay(500);
-
             // Kill any remaining processes if needed
             var pythonProcesses = Process.GetProcessesByName("python");
             var aliveProcesses = pythonProcesses.Where(p => !p.HasExited).ToList();
@@ -406,12 +403,10 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             // Stop face training process properly
             try
             {
+                // Returns once Python has exited (camera released) or was terminated
                 await _faceTrainingService.StopTrainingSessionAsync();
                 UpdateStatus("Face training stop command sent");
 
-                // Give time for Python to cleanup properly (camera.release(), etc.)
-                await Task.Delay(1500);
-
                 // Only kill processes if they haven't exited cleanly
                 var pythonProcesses = Process.GetProcessesByName("python");
                 var aliveProcesses = pythonProcesses.Where(p => !p.HasExited).ToList();
@@ -443,9 +438,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
 
                 // CRITICAL FIX: Force stop the video service first to reset its state
                 UpdateStatus("Ensuring video service is fully stopped...");
-                _videoService.StopVideoFeed(); // This resets _isRunning to false
-
-                await Task.Delay(500); // Give it time to fully stop
+                await _videoService.StopVideoFeedAsync(); // This resets _isRunning to false
 
                 // Restart normal video feed
                 UpdateStatus("Restarting normal video feed...");
@@ -911,8 +904,8 @@ namespace NewwaysAdmin.WorkerAttendance.UI
                 // Clean up InstructionsControl event subscriptions
                 Instructions.Cleanup();
 
-                // Stop services
-                _videoService.StopVideoFeed();
+                // Stop services (fire-and-forget - Python also exits on its own when stdin closes)
+                _ = Task.Run(async () => await _videoService.StopVideoFeedAsync());
 
                 // Stop training service synchronously (fire-and-forget)
                 _ = Task.Run(async () => await _faceTrainingService.StopTrainingSessionAsync());
@@ -1,6 +1,26 @@
 # File: unified_video_detection.py
 # Purpose: Face detection and recognition with improved best-match logic
 # UPDATED: Fixed recognize_face to compare ALL workers before deciding
+# DEPLOYMENT: cvtColor/resize pick their SIMD kernels at runtime - the OpenCV build must list
+#             AVX2 under "Dispatched code generation" (stock opencv-python wheels do). Builds made
+#             with only SSE3 fall back to ~2x slower color conversion; initialize() reports this.
+#             dlib (face_locations/face_encodings) only vectorizes what it was compiled for - build it
+#             from source with SIMD enabled instead of using a generic wheel:
+#               x86: python setup.py install --set USE_AVX_INSTRUCTIONS=1 --compiler-flags "-O3 -mavx2 -mfma"
+#               ARM: python setup.py install --set USE_NEON_INSTRUCTIONS=1 --compiler-flags "-O3"
+#             face_encodings' ResNet runs its matrix products through BLAS - build dlib against an
+#             OpenMP-threaded BLAS (DLIB_USE_BLAS=1 with OpenBLAS/MKL); the thread count is set below.
+#             Imports video_common.py, which lives in NewwaysAdmin.WorkerAttendance.Python and is linked into
+#             this project's Python output folder - run the script from the build output, or add that
+#             folder to PYTHONPATH when running it from the source tree.
+
+import os
+
+# BLAS/OpenMP pools are sized when the libraries load, so this must run before numpy/cv2/dlib are imported.
+# Half the cores: the capture and encoder threads need the rest. An explicit environment setting wins.
+BLAS_THREADS = str(max(1, (os.cpu_count() or 2) // 2))
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, BLAS_THREADS)
 
 import cv2
 import base64
@@ -8,16 +28,40 @@ import json
 import sys
 import time
 import threading
-import os
+import queue
+import glob
+import hashlib
+import tempfile
 import numpy as np
+import dlib
 import face_recognition
 
+# Shared with face_training_capture.py - deployed next to both scripts
+from video_common import TextSprite, open_camera, put_latest, write_frame, write_message
+
+# Optional: faiss (pip install faiss-cpu) does the nearest-encoding search in SIMD C++
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# CUDA dlib runs the CNN detector on the GPU; CPU-only builds stay on HOG
+USE_CNN_DETECTOR = bool(getattr(dlib, "DLIB_USE_CUDA", False))
+
+def update_detection_state(count, threshold, num_faces):
+    """Advance the sign-in detection counter, returns (new_count, threshold_reached)"""
+    if num_faces > 0:
+        count += 1
+        return count, count >= threshold
+    # Face lost - decay instead of resetting so a single missed frame doesn't restart the count
+    return max(count - 1, 0), False
+
 class VideoDetectionService:
     def __init__(self):
         self.cap = None
         self.face_cascade = None
         self.running = False
-        self.detection_mode = "idle"  # States: "idle", "detecting", "confirmation"
+        self.detection_mode = "idle"  # States: "idle", "detecting", "recognizing", "confirmation"
         self.detection_count = 0
         self.detection_threshold = 5
         self.recognition_result = None  # Store current recognition result for confirmation
@@ -26,56 +70,155 @@ class VideoDetectionService:
         self.workers = []
         self.recognition_enabled = False
         
+        # All stored encodings stacked into one (N, 128) float32 matrix, grouped by worker (see build_encoding_matrix)
+        self._enc_matrix = None
+        self._enc_worker_idx = None   # Row -> index into self.workers
+        self._enc_sub_idx = None      # Row -> index into that worker's 'encodings'
+        self._enc_sq_norms = None     # Squared length of every row, for the dot-product distance
+        self._worker_starts = None    # First row of each worker, for np.minimum.reduceat
+        self._index = None            # faiss.IndexFlatL2 over the same rows, when faiss is installed
+        self._index_k = 0             # Neighbours to fetch so at least two distinct workers come back
+        
+        # Parsed workers are cached as one .npz keyed by the worker files' names/sizes/mtimes
+        self.cache_folder = os.path.join(tempfile.gettempdir(), "NewwaysAdmin")
+        self._workers_signature = None
+        self._worker_file_cache = {}  # filepath -> ((mtime_ns, size), worker record or None)
+        
         # UPDATED: Strict thresholds to prevent false positives
         self.min_confidence_distance = 0.45  # Maximum distance (55% minimum confidence)
         self.ambiguity_threshold = 0.15      # Minimum gap between 1st and 2nd place (15%)
         
+        # Commands from C# arrive on stdin, read by a background thread
+        self._commands = queue.Queue()
+        
+        # Pipeline: capture thread -> main loop (detect/recognize/draw) -> encoder thread.
+        # The camera read paces the loop; detection of one frame overlaps reading the next and encoding the last.
+        self._capture_q = queue.Queue(maxsize=2)
+        self._capture_thread = None
+        
+        # JPEG encode + stdout write run on their own thread, overlapping the next frame's detection.
+        # Throwaway preview: quality 70 and no Huffman optimisation pass (a second scan over the coefficients)
+        self.jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), 70, int(cv2.IMWRITE_JPEG_OPTIMIZE), 0]
+        self._encode_q = queue.Queue(maxsize=2)
+        self._encoder_thread = None
+        
+        # Recognition (dlib detect + encode + match, 50-200 ms) runs on its own thread so the preview keeps moving.
+        # Attempts are numbered - a result for an attempt that was cancelled or superseded is dropped
+        self._recognition_q = queue.Queue(maxsize=1)
+        self._recognition_results = queue.Queue()
+        self._recognition_thread = None
+        self._recognition_seq = 0
+        self._workers_lock = threading.Lock()  # Held while matching and while (re)loading workers
+        
+        # Detection sees every camera frame, the UI preview only every Nth (15 FPS is plenty for a preview)
+        self.preview_every = 2
+        self._frame_seq = 0
+        # An empty, motionless idle scene is re-sent only this often (seconds) - the frames are all the same
+        self.static_preview_interval = 1.0
+        self._last_preview_time = 0.0
+        
+        # Detection runs on a copy this wide, boxes are scaled back up (encodings still use full resolution)
+        self.detection_width = 320
+        # (the CNN detector's ~80 px minimum face needs one upsample at this width, same as HOG's default)
+        self.detection_model = "cnn" if USE_CNN_DETECTOR else "hog"
+        self.detection_upsample = 1
+        
+        # Startup encoding time above which the dlib build is reported as slow (AVX2 builds take ~20-60 ms)
+        self.max_encoding_ms = 150
+        
+        # Face size range at the kiosk in full-frame pixels - the cascade skips pyramid levels outside it
+        self.min_face_size = 96
+        self.max_face_size = 400
+        # While counting a sign-in only the central band of the frame is searched - the worker stands in front
+        self.detecting_roi_width = 0.7
+        
+        # Idle preview only re-runs Haar every Nth frame, boxes are reused in between
+        self.idle_detection_interval = 3
+        # Same while waiting for the confirmation tap - the box just has to follow the person loosely
+        self.confirmation_detection_interval = 6
+        self._idle_frame_counter = 0
+        self._cached_faces = []
+        
+        # ...and only when the scene moved since the last idle check (absdiff is ~100x cheaper than a cascade)
+        self.motion_pixel_threshold = 15     # Per-pixel gray change that counts as motion
+        self.motion_min_pixels = 500         # Changed pixels (on the detection copy) that count as a moving scene
+        self.motion_recheck_interval = 5     # Static checks before the cascade runs anyway (drift recovery)
+        self._prev_gray = None
+        self._motion_mask = None
+        self._static_checks = 0
+        
+        # Reused cvtColor/resize outputs of the main loop - allocated on the first frame, then written in place
+        # (the recognition thread never touches these, it works on its own per-attempt copies)
+        self._gray = None
+        self._small = None
+        
+        # Constant labels are pre-rendered, only text with live values goes through putText
+        self._face_detected_text = TextSprite("FACE DETECTED", 0.5, (0, 255, 255))
+        self._waiting_text = TextSprite("WAITING FOR CONFIRMATION", 1, (255, 0, 255))
+        self._no_face_text = TextSprite("CONFIRMATION: No face visible", 1, (255, 0, 255))
+        self._recognizing_text = TextSprite("RECOGNIZING...", 1, (0, 255, 0))
+        
     def send_message(self, msg_type, **kwargs):
         """Send JSON message to C#"""
-        message = {"type": msg_type, "timestamp": time.time(), **kwargs}
-        print(json.dumps(message))
-        sys.stdout.flush()
+        write_message(msg_type, **kwargs)
         
+    def send_frame(self, frame):
+        """Send video frame to C# as a JSON header line followed by the raw JPEG bytes"""
+        ok, buffer = cv2.imencode('.jpg', frame, self.jpeg_params)
+        if not ok:
+            self.send_message("error", message="JPEG encode failed")
+            return
+        write_frame(buffer)
+    
+    def encoder_loop(self):
+        """Background thread: encode and send finished frames"""
+        while self.running:
+            try:
+                frame = self._encode_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.send_frame(frame)
+            except Exception as e:
+                self.send_message("error", message=f"Error sending frame: {str(e)}")
+    
+    def capture_loop(self):
+        """Background thread: the only reader of the VideoCapture - None is queued when the camera fails"""
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.send_message("error", message="Failed to read frame")
+                put_latest(self._capture_q, None)
+                return
+            put_latest(self._capture_q, frame)
+    
     def load_workers(self):
         """Load worker face encodings from JSON files"""
         try:
             workers_folder = r"C:\NewwaysAdmin\WorkerAttendance"
-            self.workers = []
                         
             if not os.path.exists(workers_folder):
+                self.workers = []
+                self.build_encoding_matrix()
                 self.send_message("error", message=f"Workers folder not found: {workers_folder}")
                 return False
             
-            worker_count = 0
-            json_files = [f for f in os.listdir(workers_folder) if f.endswith('.json')]
+            json_files = sorted(f for f in os.listdir(workers_folder) if f.endswith('.json'))
+            signature = self.workers_signature(workers_folder, json_files)
+            cache_path = os.path.join(self.cache_folder, f"worker_encodings_{signature}.npz")
             
-            for filename in json_files:
-                filepath = os.path.join(workers_folder, filename)
-                try:
-                    with open(filepath, 'r') as f:
-                        worker_data = json.load(f)
-                        
-                    # Skip inactive workers
-                    if not worker_data.get('IsActive', True):
-                        continue
-                        
-                    # Decode face encodings from base64
-                    face_encodings = []
-                    for encoding_b64 in worker_data.get('FaceEncodings', []):
-                        encoding_bytes = base64.b64decode(encoding_b64)
-                        encoding_array = np.frombuffer(encoding_bytes, dtype=np.float64)
-                        face_encodings.append(encoding_array)
-                    
-                    if face_encodings:  # Only add workers with face data
-                        self.workers.append({
-                            'id': worker_data.get('Id', 0),
-                            'name': worker_data.get('Name', 'Unknown'),
-                            'encodings': face_encodings
-                        })
-                        worker_count += 1
-                        
-                except Exception as e:
-                    self.send_message("status", message=f"Error loading {filename}: {str(e)}")
+            if signature == self._workers_signature and self.workers:
+                self.send_message("status", message=f"Worker files unchanged - keeping {len(self.workers)} workers")
+                return True
+            
+            self.workers = []
+            if not self.load_workers_cache(cache_path):
+                self.load_workers_json(workers_folder, json_files)
+                self.save_workers_cache(cache_path)
+            
+            self.build_encoding_matrix()
+            self._workers_signature = signature
+            worker_count = len(self.workers)
             
             if worker_count > 0:
                 self.recognition_enabled = True
@@ -89,6 +232,182 @@ class VideoDetectionService:
             self.send_message("error", message=f"Failed to load workers: {str(e)}")
             return False
     
+    def load_workers_json(self, workers_folder, json_files):
+        """Parse worker JSON files into self.workers (active workers with face data only)"""
+        file_cache = {}
+        for filename in json_files:
+            filepath = os.path.join(workers_folder, filename)
+            try:
+                # Files unchanged since the last reload reuse their parsed record - no JSON/base64 work
+                st = os.stat(filepath)
+                key = (st.st_mtime_ns, st.st_size)
+                cached = self._worker_file_cache.get(filepath)
+                if cached and cached[0] == key:
+                    file_cache[filepath] = cached
+                    if cached[1]:
+                        self.workers.append(cached[1])
+                    continue
+                
+                file_cache[filepath] = (key, None)
+                with open(filepath, 'r') as f:
+                    worker_data = json.load(f)
+                    
+                # Skip inactive workers
+                if not worker_data.get('IsActive', True):
+                    continue
+                    
+                # Decode face encodings from base64 into one (k, 128) array - a single buffer per worker
+                encoding_bytes = b''.join(base64.b64decode(encoding_b64)
+                                          for encoding_b64 in worker_data.get('FaceEncodings', []))
+                face_encodings = np.frombuffer(encoding_bytes, dtype=np.float64).reshape(-1, 128)
+                
+                if len(face_encodings):  # Only add workers with face data
+                    worker = {
+                        'id': worker_data.get('Id', 0),
+                        'name': worker_data.get('Name', 'Unknown'),
+                        'encodings': face_encodings
+                    }
+                    self.workers.append(worker)
+                    file_cache[filepath] = (key, worker)
+                    
+            except Exception as e:
+                file_cache.pop(filepath, None)  # Retry a broken file on the next reload
+                self.send_message("status", message=f"Error loading {filename}: {str(e)}")
+        
+        # Deleted files drop out of the cache
+        self._worker_file_cache = file_cache
+    
+    def workers_signature(self, workers_folder, json_files):
+        """Hash of every worker file's name, size and mtime - changes whenever C# saves a worker"""
+        entries = []
+        for filename in json_files:
+            st = os.stat(os.path.join(workers_folder, filename))
+            entries.append((filename, st.st_size, st.st_mtime_ns))
+        return hashlib.sha1(repr(entries).encode()).hexdigest()
+    
+    def load_workers_cache(self, cache_path):
+        """Fill self.workers from a cache file, returns False when there is no usable cache"""
+        if not os.path.exists(cache_path):
+            return False
+        
+        try:
+            with np.load(cache_path) as cache:
+                matrix = cache['enc_matrix']
+                worker_idx = cache['enc_worker_idx']
+                info = json.loads(str(cache['workers']))
+            
+            for w, worker in enumerate(info):
+                self.workers.append({
+                    'id': worker['id'],
+                    'name': worker['name'],
+                    'encodings': matrix[worker_idx == w]
+                })
+            return True
+            
+        except Exception as e:
+            self.send_message("status", message=f"Ignoring worker cache: {str(e)}")
+            self.workers = []
+            return False
+    
+    def save_workers_cache(self, cache_path):
+        """Write self.workers to the cache file and remove caches for older worker file versions"""
+        if not self.workers:
+            return
+        
+        try:
+            os.makedirs(self.cache_folder, exist_ok=True)
+            for stale_path in glob.glob(os.path.join(self.cache_folder, "worker_encodings_*.npz")):
+                os.remove(stale_path)
+            
+            matrix = np.vstack([worker['encodings'] for worker in self.workers])
+            worker_idx = np.repeat(np.arange(len(self.workers)), [len(w['encodings']) for w in self.workers])
+            info = [{'id': w['id'], 'name': w['name']} for w in self.workers]
+            
+            # Write then rename, so a crash never leaves a truncated cache under the final name
+            temp_path = cache_path + ".tmp.npz"
+            np.savez(temp_path, enc_matrix=matrix, enc_worker_idx=worker_idx, workers=np.array(json.dumps(info)))
+            os.replace(temp_path, cache_path)
+            
+        except Exception as e:
+            self.send_message("status", message=f"Could not write worker cache: {str(e)}")
+    
+    def build_encoding_matrix(self):
+        """Stack every worker's encodings into one matrix so matching is a single vectorized pass"""
+        if not self.workers:
+            self._enc_matrix = self._enc_worker_idx = self._enc_sub_idx = self._worker_starts = None
+            self._index = None
+            return
+        
+        counts = [len(worker['encodings']) for worker in self.workers]
+        
+        # float32 halves the bytes streamed per match - far below the 0.45/0.15 threshold resolution
+        self._enc_matrix = np.vstack([worker['encodings'] for worker in self.workers]).astype(np.float32)
+        self._enc_worker_idx = np.repeat(np.arange(len(self.workers)), counts)
+        self._enc_sub_idx = np.concatenate([np.arange(count) for count in counts])
+        self._enc_sq_norms = np.einsum('ij,ij->i', self._enc_matrix, self._enc_matrix)
+        # Rows are grouped by worker (every loaded worker has at least one encoding)
+        self._worker_starts = np.flatnonzero(np.r_[True, np.diff(self._enc_worker_idx) != 0])
+        
+        # Exact L2 index - the best worker fills at most max-encodings slots, one more reaches the runner-up.
+        # Kept exact on purpose: the ambiguity check needs the true runner-up, which an approximate index
+        # (e.g. HNSW) can miss - and would then accept a match the exact scan rejects
+        if faiss is not None:
+            self._index = faiss.IndexFlatL2(self._enc_matrix.shape[1])
+            self._index.add(self._enc_matrix)
+            self._index_k = min(len(self._enc_matrix), max(counts) + 1)
+        else:
+            self._index = None
+    
+    def nearest_workers(self, face_encoding):
+        """Best and second-best workers as [(worker index, distance, encoding row)], nearest first"""
+        probe = np.asarray(face_encoding, dtype=np.float32)
+        
+        if self._index is not None:
+            nearest = self.nearest_workers_indexed(probe)
+            # The numpy scan covers the case of the index coming back short
+            if len(nearest) >= min(2, len(self.workers)):
+                return nearest
+        
+        return self.nearest_workers_exact(probe)
+    
+    def nearest_workers_indexed(self, probe):
+        """nearest_workers via the faiss index - may return fewer than two workers (or none)"""
+        squared, found = self._index.search(probe.reshape(1, -1), self._index_k)
+        nearest = []
+        for d2, row in zip(squared[0], found[0]):
+            if row < 0:
+                break
+            w = int(self._enc_worker_idx[row])
+            if all(w != seen for seen, _, _ in nearest):
+                nearest.append((w, float(np.sqrt(max(d2, 0.0))), int(row)))
+                if len(nearest) == 2:
+                    break
+        return nearest
+    
+    def nearest_workers_exact(self, probe):
+        """nearest_workers by scanning every stored encoding"""
+        # Euclidean distance to ALL stored encodings (same metric as face_distance) from one BLAS
+        # matrix-vector product: |a - b|^2 = |a|^2 + |b|^2 - 2 a.b, no (N, 128) difference temporary
+        squared = np.maximum(self._enc_sq_norms + probe.dot(probe) - 2.0 * (self._enc_matrix @ probe), 0.0)
+        
+        # BEST encoding distance per worker (not just first encoding) - ranked on squared distances,
+        # sqrt is monotonic so it is only taken for the two workers returned
+        worker_best = np.minimum.reduceat(squared, self._worker_starts)
+        
+        # Best and second-best workers without sorting everyone
+        if len(worker_best) > 1:
+            top2 = np.argpartition(worker_best, 1)[:2]
+            top2 = top2[np.argsort(worker_best[top2])]
+        else:
+            top2 = np.array([0])
+        
+        nearest = []
+        for w in top2:
+            start = self._worker_starts[w]
+            row = start + int(np.argmin(squared[start:start + len(self.workers[w]['encodings'])]))
+            nearest.append((int(w), float(np.sqrt(worker_best[w])), row))
+        return nearest
+    
     def recognize_face(self, face_encoding):
         """
         UPDATED: Find the BEST match across ALL workers with strict validation.
@@ -99,39 +418,16 @@ class VideoDetectionService:
         3. Applies strict confidence threshold (55% minimum)
         4. Rejects ambiguous matches (top 2 must differ by 15%+)
         """
-        if not self.recognition_enabled or not self.workers:
+        if not self.recognition_enabled or not self.workers or self._enc_matrix is None:
             return None
             
         try:
-            # Step 1: Collect ALL matches with their distances
-            all_matches = []
-            
-            for worker in self.workers:
-                # Find BEST encoding match for THIS worker (not just first encoding)
-                best_distance = float('inf')
-                best_encoding_index = -1
-                
-                for idx, stored_encoding in enumerate(worker['encodings']):
-                    distance = face_recognition.face_distance([stored_encoding], face_encoding)[0]
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_encoding_index = idx
-                
-                # Record this worker's best match
-                confidence = round((1.0 - best_distance) * 100, 1)
-                all_matches.append({
-                    'worker': worker,
-                    'distance': best_distance,
-                    'confidence': confidence,
-                    'encoding_index': best_encoding_index
-                })
-            
-            # Step 2: Sort by distance (ascending = best matches first)
-            all_matches.sort(key=lambda x: x['distance'])
-            
-            # Step 3: Get best and second-best matches
-            best_match = all_matches[0]
-            second_best = all_matches[1] if len(all_matches) > 1 else None
+            # Steps 1-3: best encoding per worker across ALL workers, keep the top two
+            nearest = self.nearest_workers(face_encoding)
+            if not nearest:
+                return None
+            best_match = self.worker_match(*nearest[0])
+            second_best = self.worker_match(*nearest[1]) if len(nearest) > 1 else None
             
             # Step 4: Apply strict validation thresholds
             
@@ -168,132 +464,236 @@ class VideoDetectionService:
             self.send_message("error", message=f"Recognition error: {str(e)}")
             return None
     
+    def worker_match(self, w, distance, row):
+        """Match record for worker index w: its best distance, confidence and which encoding produced it"""
+        return {
+            'worker': self.workers[w],
+            'distance': distance,  # Plain float - stays JSON serializable
+            'confidence': round((1.0 - distance) * 100, 1),
+            'encoding_index': int(self._enc_sub_idx[row])
+        }
+    
     def initialize(self):
         """Initialize camera and face detection"""
         self.send_message("status", message="Initializing camera and loading workers...")
         
         self.load_workers()
         
-        self.cap = cv2.VideoCapture(0)
+        self.cap = open_camera()
         if not self.cap.isOpened():
             self.send_message("error", message="Could not open camera")
             return False
             
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.face_cascade = self.load_face_cascade()
+        
+        self.check_opencv_simd()
+        self.check_dlib_simd()
+        if self.recognition_enabled:
+            self.check_encoding_speed()
         
-        status_msg = "Camera initialized"
+        status_msg = f"Camera initialized ({self.detection_model.upper()} detector)"
         if self.recognition_enabled:
             status_msg += f" with {len(self.workers)} workers loaded"
         
         self.send_message("status", message=status_msg)
         return True
         
-    def process_frame(self):
+    def load_face_cascade(self):
+        """Presence detector for the preview: LBP when its XML is available (2-3x faster), else Haar"""
+        # opencv-python wheels only bundle the Haar XMLs - the LBP one can be deployed next to this script
+        candidates = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lbpcascade_frontalface_improved.xml')]
+        lbp_folder = getattr(cv2.data, 'lbpcascades', None)
+        if lbp_folder:
+            candidates.append(os.path.join(lbp_folder, 'lbpcascade_frontalface_improved.xml'))
+        
+        for path in candidates:
+            if os.path.exists(path):
+                cascade = cv2.CascadeClassifier(path)
+                if not cascade.empty():
+                    self.send_message("status", message="Using LBP face cascade for preview")
+                    return cascade
+        
+        return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    
+    def check_opencv_simd(self):
+        """Make sure OpenCV's vectorized kernels are enabled and warn if AVX2 is not dispatched"""
+        cv2.setUseOptimized(True)
+        
+        dispatched = ""
+        jpeg_codec = ""
+        for line in cv2.getBuildInformation().splitlines():
+            if "Dispatched code generation" in line:
+                dispatched = line.split(":", 1)[1]
+            elif line.strip().startswith("JPEG:"):
+                jpeg_codec = line.split(":", 1)[1]
+        
+        if "AVX2" not in dispatched.split():
+            self.send_message("status", message="Warning: OpenCV build has no AVX2 dispatch - color conversion will be slower")
+        # libjpeg-turbo (bundled with opencv-python) has the SIMD encoder the preview stream relies on
+        if "turbo" not in jpeg_codec:
+            self.send_message("status", message="Warning: OpenCV not built with libjpeg-turbo - preview JPEG encoding will be slower")
+        
+    def check_dlib_simd(self):
+        """Warn if dlib was built without AVX/NEON - detection and encoding run several times slower"""
+        if not (getattr(dlib, "USE_AVX_INSTRUCTIONS", False) or getattr(dlib, "USE_NEON_INSTRUCTIONS", False)):
+            self.send_message("status", message="Warning: dlib built without AVX/NEON - face recognition will be slower")
+        
+        blas = "BLAS" if getattr(dlib, "DLIB_USE_BLAS", False) else "no BLAS"
+        self.send_message("status", message=f"dlib: {blas}, OMP_NUM_THREADS={os.environ['OMP_NUM_THREADS']}")
+        
+    def check_encoding_speed(self):
+        """Time one face encoding at startup - verifies the dlib build and warms it up before the first sign-in"""
+        probe = np.full((150, 150, 3), 128, dtype=np.uint8)
+        start = time.perf_counter()
+        face_recognition.face_encodings(probe, [(0, 150, 150, 0)])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        if elapsed_ms > self.max_encoding_ms:
+            self.send_message("status", message=f"Warning: face encoding took {elapsed_ms:.0f} ms - dlib is probably a generic (non-AVX) build")
+        else:
+            self.send_message("status", message=f"Face encoding check: {elapsed_ms:.0f} ms")
+        
+    def downscale(self, image, scale):
+        """Resize into the reused detection buffer (INTER_AREA keeps small faces from aliasing)"""
+        if scale >= 1.0:
+            return image
+        size = (round(image.shape[1] * scale), round(image.shape[0] * scale))
+        self._small = cv2.resize(image, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return self._small
+        
+    def scene_changed(self, gray):
+        """Motion gate for idle detection: compare with the previous idle check, force a re-check every Nth time"""
+        prev = self._prev_gray
+        # Keep this frame's gray as the next reference - swap buffers so neither is reallocated
+        self._prev_gray, self._gray = gray, prev
+        
+        if prev is None or prev.shape != gray.shape or self._static_checks >= self.motion_recheck_interval:
+            self._static_checks = 0
+            return True
+        
+        self._motion_mask = cv2.absdiff(gray, prev, dst=self._motion_mask)
+        cv2.threshold(self._motion_mask, self.motion_pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._motion_mask)
+        if cv2.countNonZero(self._motion_mask) >= self.motion_min_pixels:
+            self._static_checks = 0
+            return True
+        
+        self._static_checks += 1
+        return False
+    
+    def locate_faces_dlib(self, rgb_frame, scale):
+        """Slow but accurate dlib detector (for recognition) - boxes in full-frame (top, right, bottom, left)"""
+        # Runs on the recognition thread - resize into a fresh array, self._small belongs to the main loop
+        if scale < 1.0:
+            size = (round(rgb_frame.shape[1] * scale), round(rgb_frame.shape[0] * scale))
+            rgb_frame = cv2.resize(rgb_frame, size, interpolation=cv2.INTER_AREA)
+        small_locations = face_recognition.face_locations(rgb_frame,
+                                                          number_of_times_to_upsample=self.detection_upsample,
+                                                          model=self.detection_model)
+        return [(int(top / scale), int(right / scale), int(bottom / scale), int(left / scale))
+                for (top, right, bottom, left) in small_locations]
+    
+    def preview_unchanged(self):
+        """True when idle with no faces and the last motion check saw a static scene"""
+        return (self.detection_mode == "idle" and len(self._cached_faces) == 0 and self._static_checks > 0
+                and time.monotonic() - self._last_preview_time < self.static_preview_interval)
+    
+    def process_frame(self, frame):
         """Process single frame with face detection AND recognition"""
-        ret, frame = self.cap.read()
-        if not ret:
-            self.send_message("error", message="Failed to read frame")
-            return None
+        # PERFORMANCE FIX: The slow dlib detector only runs on the one frame that is recognized,
+        # on the recognition thread. Counting, confirmation and idle preview use the fast Haar Cascade
+        self.apply_recognition_results()
+        
+        # Detect on a downscaled copy - pixel work drops with the square of the scale
+        scale = min(1.0, self.detection_width / frame.shape[1])
         
-        # PERFORMANCE FIX: Only use slow dlib detector when actually recognizing
-        # In idle mode, use fast Haar Cascade for smooth frame rate
-        use_dlib_detector = self.recognition_enabled and (
-            self.detection_mode == "detecting" or 
-            self.detection_mode == "confirmation"
-        )
-        
-        if use_dlib_detector:
-            # Slow but accurate dlib detector (for recognition)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
-            faces = [(left, top, right-left, bottom-top) for (top, right, bottom, left) in face_locations]
+        if self.detection_mode == "idle":
+            detection_interval = self.idle_detection_interval
+        elif self.detection_mode in ("confirmation", "recognizing"):
+            detection_interval = self.confirmation_detection_interval
         else:
-            # Fast Haar Cascade detector (for idle preview)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            face_locations_cv = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-            faces = face_locations_cv
-            face_locations = []
-            rgb_frame = None  # Not needed in idle mode
+            detection_interval = 1
+        
+        if self._idle_frame_counter % detection_interval != 0:
+            # Preview between detection frames - nothing depends on these boxes but the overlay
+            self._idle_frame_counter += 1
+            faces = self._cached_faces
+        else:
+            # Fast Haar Cascade detector
+            gray = self._gray = cv2.cvtColor(self.downscale(frame, scale), cv2.COLOR_BGR2GRAY, dst=self._gray)
+            if self.detection_mode == "idle" and not self.scene_changed(gray):
+                # Static scene - the last boxes are still right
+                faces = self._cached_faces
+            else:
+                roi_x = 0
+                if self.detection_mode == "detecting":
+                    roi_w = int(gray.shape[1] * self.detecting_roi_width)
+                    roi_x = (gray.shape[1] - roi_w) // 2
+                    gray = gray[:, roi_x:roi_x + roi_w]
+                min_size = int(self.min_face_size * scale)
+                max_size = int(self.max_face_size * scale)
+                face_locations_cv = self.face_cascade.detectMultiScale(gray, 1.3, 5,
+                                                                       minSize=(min_size, min_size),
+                                                                       maxSize=(max_size, max_size))
+                if len(face_locations_cv) and roi_x:
+                    face_locations_cv[:, 0] += roi_x
+                faces = self._cached_faces = (np.asarray(face_locations_cv) / scale).astype(np.int32)
+            self._idle_frame_counter += 1
         
         # Handle detection mode for sign-in
         if self.detection_mode == "detecting":
+            self.detection_count, threshold_reached = update_detection_state(
+                self.detection_count, self.detection_threshold, len(faces))
+            progress = f"{self.detection_count}/{self.detection_threshold}"
+            
+            # Check if threshold reached - the recognition copy is taken before any overlay is drawn
+            if threshold_reached:
+                if self.recognition_enabled:
+                    self._recognition_seq += 1
+                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Own buffer - outlives this frame
+                    put_latest(self._recognition_q, (self._recognition_seq, rgb_frame, scale, faces))
+                    self.detection_mode = "recognizing"
+                else:
+                    self.finish_signin(None, faces)
+            
             if len(faces) > 0:
-                self.detection_count += 1
-                
-                # Draw GREEN rectangles for detection
+                # Draw GREEN rectangles for detection (label formatted once, not per face)
+                face_label = f"DETECTING {progress}"
                 for (x, y, w, h) in faces:
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 3)
-                    cv2.putText(frame, f"DETECTING {self.detection_count}/{self.detection_threshold}", (x, y-10), 
+                    cv2.putText(frame, face_label, (x, y-10), 
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
                 
-                cv2.putText(frame, f"DETECTION: {self.detection_count}/{self.detection_threshold}", 
+                cv2.putText(frame, f"DETECTION: {progress}", 
                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-                
-                # Check if threshold reached
-                if self.detection_count >= self.detection_threshold:
-                    recognition_result = None
-                    if self.recognition_enabled and face_locations:
-                        # Convert to RGB for recognition if not already done
-                        if rgb_frame is None:
-                            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                        if face_encodings:
-                            recognition_result = self.recognize_face(face_encodings[0])  # First face only
-                    
-                    if recognition_result:
-                        self.send_message("signin_recognition", 
-                                        worker_name=recognition_result['worker_name'],
-                                        confidence=recognition_result['confidence'],
-                                        worker_id=recognition_result['worker_id'])
-                        
-                        # Move to confirmation state, stop counting
-                        self.detection_mode = "confirmation"
-                        self.recognition_result = recognition_result
-                        self.send_message("status", message=f"Waiting for confirmation: {recognition_result['worker_name']}")
-                    else:
-                        face_data = []
-                        for i, (x, y, w, h) in enumerate(faces):
-                            face_data.append({
-                                "id": f"face_{i+1}",
-                                "confidence": 0.8,
-                                "position": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)}
-                            })
-                        
-                        self.send_message("signin_unknown", 
-                                        message="Face not recognized - please try again",
-                                        faces=face_data)
-                        
-                        # Reset to idle
-                        self.detection_mode = "idle"
-                        self.detection_count = 0
             else:
-                if self.detection_count > 0:
-                    self.detection_count -= 1
-                    
-                cv2.putText(frame, f"SCANNING: {self.detection_count}/{self.detection_threshold}", 
+                cv2.putText(frame, f"SCANNING: {progress}", 
                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
         
+        elif self.detection_mode == "recognizing":
+            # Result pending on the recognition thread - keep the preview live
+            for (x, y, w, h) in faces:
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 3)
+            self._recognizing_text.draw(frame, (10, 30))
+        
         elif self.detection_mode == "confirmation":
             # Show confirmation UI, don't increment count
             if len(faces) > 0:
+                confirm_label = f"CONFIRM: {self.recognition_result['worker_name']} ({self.recognition_result['confidence']:.0f}%)"
                 for (x, y, w, h) in faces:
                     cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 255), 3)  # Purple for confirmation
-                    cv2.putText(frame, f"CONFIRM: {self.recognition_result['worker_name']} ({self.recognition_result['confidence']:.0f}%)", 
+                    cv2.putText(frame, confirm_label, 
                                (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 2)
               
-                cv2.putText(frame, "WAITING FOR CONFIRMATION", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+                self._waiting_text.draw(frame, (10, 30))
             else:
-                cv2.putText(frame, "CONFIRMATION: No face visible", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
+                self._no_face_text.draw(frame, (10, 30))
         
         else:  # idle mode (real-time preview - NO RECOGNITION for performance)
             # OPTIMIZATION: Skip recognition in idle mode to maintain good frame rate
             # Recognition only happens when user presses SIGN IN button (detecting mode)
             for (x, y, w, h) in faces:
                 cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 255), 2)
-                cv2.putText(frame, "FACE DETECTED", (x, y-10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
+                self._face_detected_text.draw(frame, (x, y-10))
             
             # Status display
             if len(faces) > 0:
@@ -309,6 +709,75 @@ class VideoDetectionService:
         
         return frame
         
+    def recognize_frame(self, rgb_frame, scale):
+        """Locate, encode and match the nearest face in an RGB frame - returns the match dict or None"""
+        face_locations = self.locate_faces_dlib(rgb_frame, scale)
+        if not face_locations:
+            return None
+        
+        # One sign-in per tap: only the largest (nearest) face is encoded - the ResNet
+        # pass per face is the expensive part, bystanders are never recognized anyway
+        nearest_face = max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+        face_encodings = face_recognition.face_encodings(rgb_frame, [nearest_face])
+        if not face_encodings:
+            return None
+        
+        with self._workers_lock:
+            return self.recognize_face(face_encodings[0])
+    
+    def recognition_loop(self):
+        """Background thread: recognize frames handed over when the detection threshold is reached"""
+        while self.running:
+            try:
+                seq, rgb_frame, scale, faces = self._recognition_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                recognition_result = self.recognize_frame(rgb_frame, scale)
+            except Exception as e:
+                self.send_message("error", message=f"Recognition error: {str(e)}")
+                recognition_result = None
+            self._recognition_results.put((seq, recognition_result, faces))
+    
+    def apply_recognition_results(self):
+        """Act on finished recognitions (main thread) - stale attempts are ignored"""
+        while True:
+            try:
+                seq, recognition_result, faces = self._recognition_results.get_nowait()
+            except queue.Empty:
+                return
+            if self.detection_mode == "recognizing" and seq == self._recognition_seq:
+                self.finish_signin(recognition_result, faces)
+    
+    def finish_signin(self, recognition_result, faces):
+        """Report the outcome of a sign-in attempt and move to confirmation or back to idle"""
+        if recognition_result:
+            self.send_message("signin_recognition", 
+                            worker_name=recognition_result['worker_name'],
+                            confidence=recognition_result['confidence'],
+                            worker_id=recognition_result['worker_id'])
+            
+            # Move to confirmation state, stop counting
+            self.detection_mode = "confirmation"
+            self.recognition_result = recognition_result
+            self.send_message("status", message=f"Waiting for confirmation: {recognition_result['worker_name']}")
+        else:
+            face_data = []
+            for i, (x, y, w, h) in enumerate(faces):
+                face_data.append({
+                    "id": f"face_{i+1}",
+                    "confidence": 0.8,
+                    "position": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)}
+                })
+            
+            self.send_message("signin_unknown", 
+                            message="Face not recognized - please try again",
+                            faces=face_data)
+            
+            # Reset to idle
+            self.detection_mode = "idle"
+            self.detection_count = 0
+        
     def start_detection(self):
         """Start face detection mode for sign-in"""
         self.detection_mode = "detecting"
@@ -341,72 +810,108 @@ class VideoDetectionService:
     
     def reload_workers(self):
         """Reload worker data (for when new workers are added)"""
-        self.load_workers()
+        # Waits for an in-flight match - the encoding matrix is swapped underneath it otherwise
+        with self._workers_lock:
+            self.load_workers()
         
     def stop(self):
         """Stop the video service"""
         self.running = False
 
+    def read_commands(self):
+        """Background thread: queue command lines from C# (stdin pipe)"""
+        try:
+            for line in sys.stdin:
+                command = line.strip()
+                if command:
+                    self._commands.put(command)
+        except Exception as e:
+            self.send_message("error", message=f"Error reading commands: {str(e)}")
+        
+        # stdin closed - the C# host is gone, shut down instead of holding the camera
+        self._commands.put("stop")
+    
+    def process_pending_commands(self):
+        """Run any queued commands (no I/O when nothing is pending)"""
+        while self.running:
+            try:
+                command = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            self.handle_command(command)
+    
+    def handle_command(self, command):
+        """Dispatch a plain-text command or a JSON command ({"command": ...} / {"type": ...})"""
+        if command.startswith("{"):
+            try:
+                cmd = json.loads(command)
+                command = cmd.get("command") or cmd.get("type") or ""
+            except json.JSONDecodeError:
+                pass
+        
+        self.send_message("status", message=f"Received command: {command}")
+        
+        if command == "start_detection":
+            self.start_detection()
+        elif command == "stop_detection":
+            self.stop_detection()
+        elif command == "confirm_signin":
+            self.confirm_signin()
+        elif command == "reload_workers":
+            self.reload_workers()
+        elif command == "stop":
+            self.stop()
+
     def run_with_commands(self):
         """Main video loop with command checking"""
         if not self.initialize():
             return
             
         self.running = True
+        threading.Thread(target=self.read_commands, daemon=True).start()
+        self._encoder_thread = threading.Thread(target=self.encoder_loop, daemon=True)
+        self._encoder_thread.start()
+        self._capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self._capture_thread.start()
+        self._recognition_thread = threading.Thread(target=self.recognition_loop, daemon=True)
+        self._recognition_thread.start()
         self.send_message("status", message="Video feed started with face recognition")
         
         try:
             while self.running:
-                check_commands()
+                self.process_pending_commands()
+                if not self.running:
+                    break
                 
-                frame = self.process_frame()
+                # Blocks until the camera delivers - the timeout keeps commands flowing if it stalls
+                try:
+                    frame = self._capture_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
                 if frame is None:
                     break
-                    
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
-                self.send_message("frame", data=frame_base64)
                 
-                time.sleep(0.1)  # 10 FPS
+                frame = self.process_frame(frame)
+                self._frame_seq += 1
+                if self._frame_seq % self.preview_every == 0 and not self.preview_unchanged():
+                    self._last_preview_time = time.monotonic()
+                    put_latest(self._encode_q, frame)
                 
         except Exception as e:
             self.send_message("error", message=f"Video error: {str(e)}")
         finally:
+            self.running = False
+            if self._encoder_thread:
+                self._encoder_thread.join(timeout=1.0)
+            if self._recognition_thread:
+                self._recognition_thread.join(timeout=1.0)
+            # Let the capture thread finish its current read before releasing the device
+            if self._capture_thread:
+                self._capture_thread.join(timeout=2.0)
             if self.cap:
                 self.cap.release()
             self.send_message("status", message="Video feed stopped")
 
-# Global service instance
-video_service = VideoDetectionService()
-
-def check_commands():
-    """Check for command files from C#"""
-    import tempfile
-    
-    command_file = os.path.join(tempfile.gettempdir(), "face_detection_command.txt")
-    
-    try:
-        if os.path.exists(command_file):
-            with open(command_file, 'r') as f:
-                command = f.read().strip()
-            
-            os.remove(command_file)
-            
-            video_service.send_message("status", message=f"Received command: {command}")
-            
-            if command == "start_detection":
-                video_service.start_detection()
-            elif command == "stop_detection":
-                video_service.stop_detection()
-            elif command == "confirm_signin":
-                video_service.confirm_signin()
-            elif command == "reload_workers":
-                video_service.reload_workers()
-            elif command == "stop":
-                video_service.stop()
-                
-    except Exception as e:
-        video_service.send_message("error", message=f"Command check error: {str(e)}")
-
 if __name__ == "__main__":
+    video_service = VideoDetectionService()
     video_service.run_with_commands()
\ No newline at end of file
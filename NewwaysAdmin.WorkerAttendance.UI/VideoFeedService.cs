@@ -6,12 +6,14 @@ using System.IO;
 using System.Windows.Media.Imaging;
 using Newtonsoft.Json;
 using NewwaysAdmin.WorkerAttendance.Models;
+using NewwaysAdmin.WorkerAttendance.Services;
 
 namespace NewwaysAdmin.WorkerAttendance.UI
 {
     public class VideoFeedService
     {
         private Process? _videoProcess;
+        private const int GracefulExitTimeoutMs = 2000;
         private bool _isRunning = false;
         private string _pythonScript;
 
@@ -47,6 +49,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
                     Arguments = $"\"{_pythonScript}\"",
                     UseShellExecute = false,
                     RedirectStandardOutput = true,
+                    RedirectStandardInput = true,
                     RedirectStandardError = true,
                     CreateNoWindow = true
                 };
@@ -75,12 +78,11 @@ namespace NewwaysAdmin.WorkerAttendance.UI
         {
             try
             {
-                StatusChanged?.Invoke("Sending start_detection command via file...");
+                StatusChanged?.Invoke("Sending start_detection command...");
 
-                string commandFile = Path.Combine(Path.GetTempPath(), "face_detection_command.txt");
-                await File.WriteAllTextAsync(commandFile, "start_detection");
+                await WriteCommandAsync("start_detection");
 
-                StatusChanged?.Invoke("Command file created successfully");
+                StatusChanged?.Invoke("Command sent successfully");
             }
             catch (Exception ex)
             {
@@ -92,8 +94,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
         {
             try
             {
-                string commandFile = Path.Combine(Path.GetTempPath(), "face_detection_command.txt");
-                await File.WriteAllTextAsync(commandFile, "stop_detection");
+                await WriteCommandAsync("stop_detection");
             }
             catch (Exception ex)
             {
@@ -103,14 +104,20 @@ namespace NewwaysAdmin.WorkerAttendance.UI
 
         private async Task ReadMessagesFromPython()
         {
-            if (_videoProcess?.StandardOutput == null) return;
+            // Local reference - StopVideoFeedAsync disposes and clears the field once the process has exited
+            var process = _videoProcess;
+            if (process?.StandardOutput == null) return;
+
+            // Raw stream: frame payloads are binary JPEG bytes following their JSON header line
+            var reader = new PythonMessageReader(process.StandardOutput.BaseStream);
 
             try
             {
-                while (!_videoProcess.HasExited && _isRunning)
+                while (!process.HasExited && _isRunning)
                 {
-                    var line = await _videoProcess.StandardOutput.ReadLineAsync();
-                    if (string.IsNullOrEmpty(line)) continue;
+                    var line = await reader.ReadLineAsync();
+                    if (line == null) break;
+                    if (line.Length == 0) continue;
 
                     try
                     {
@@ -120,9 +127,19 @@ namespace NewwaysAdmin.WorkerAttendance.UI
                         switch (message.Type)
                         {
                             case "frame":
-                                if (!string.IsNullOrEmpty(message.Data))
+                                byte[]? frameBytes = null;
+                                if (message.Length > 0)
+                                {
+                                    frameBytes = await reader.ReadBytesAsync(message.Length);
+                                }
+                                else if (!string.IsNullOrEmpty(message.Data))
                                 {
-                                    var bitmap = Base64ToBitmapImage(message.Data);
+                                    frameBytes = Convert.FromBase64String(message.Data);
+                                }
+
+                                if (frameBytes != null)
+                                {
+                                    var bitmap = BytesToBitmapImage(frameBytes);
                                     if (bitmap != null)
                                     {
                                         FrameReceived?.Invoke(bitmap);
@@ -202,12 +219,10 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             }
         }
 
-        private BitmapImage? Base64ToBitmapImage(string base64String)
+        private BitmapImage? BytesToBitmapImage(byte[] imageBytes)
         {
             try
             {
-                byte[] imageBytes = Convert.FromBase64String(base64String);
-
                 var bitmap = new BitmapImage();
                 bitmap.BeginInit();
                 bitmap.StreamSource = new MemoryStream(imageBytes);
@@ -224,24 +239,31 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             }
         }
 
-        public void StopVideoFeed()
+        public async Task StopVideoFeedAsync()
         {
             try
             {
-                _isRunning = false;
-
-                if (_videoProcess?.StandardInput != null)
+                if (_videoProcess?.HasExited == false && _videoProcess.StandardInput != null)
                 {
                     var command = new { command = "stop" };
-                    _videoProcess.StandardInput.WriteLine(JsonConvert.SerializeObject(command));
-                    _videoProcess.StandardInput.Flush();
+                    await _videoProcess.StandardInput.WriteLineAsync(JsonConvert.SerializeObject(command));
+                    await _videoProcess.StandardInput.FlushAsync();
                 }
 
                 if (_videoProcess?.HasExited == false)
                 {
-                    _videoProcess.Kill();
+                    // Let Python release the camera itself - terminate only if it does not exit in time.
+                    // Either way return only once the camera handle is actually released
+                    if (!await _videoProcess.TryWaitForExitAsync(GracefulExitTimeoutMs))
+                    {
+                        _videoProcess.Kill();
+                        await _videoProcess.TryWaitForExitAsync(GracefulExitTimeoutMs);
+                    }
                 }
 
+                // Cleared only now - the reader keeps draining stdout during the wait, otherwise Python
+                // blocks on a full pipe mid-frame and never gets to exit on its own
+                _isRunning = false;
                 _videoProcess?.Dispose();
                 _videoProcess = null;
 
@@ -249,6 +271,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             }
             catch (Exception ex)
             {
+                _isRunning = false;
                 StatusChanged?.Invoke($"Error stopping video: {ex.Message}");
             }
         }
@@ -257,8 +280,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             try
             {
                 StatusChanged?.Invoke($"Sending command: {command}");
-                string commandFile = Path.Combine(Path.GetTempPath(), "face_detection_command.txt");
-                await File.WriteAllTextAsync(commandFile, command);
+                await WriteCommandAsync(command);
                 StatusChanged?.Invoke($"Command '{command}' sent successfully");
             }
             catch (Exception ex)
@@ -272,8 +294,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
             {
                 StatusChanged?.Invoke("Sending confirmation command...");
 
-                string commandFile = Path.Combine(Path.GetTempPath(), "face_detection_command.txt");
-                await File.WriteAllTextAsync(commandFile, "confirm_signin");
+                await WriteCommandAsync("confirm_signin");
 
                 StatusChanged?.Invoke("Confirmation command sent");
             }
@@ -282,6 +303,19 @@ namespace NewwaysAdmin.WorkerAttendance.UI
                 StatusChanged?.Invoke($"Error sending confirmation: {ex.Message}");
             }
         }
+
+        /// <summary>
+        /// Send one command line to the Python process over its stdin pipe
+        /// </summary>
+        private async Task WriteCommandAsync(string command)
+        {
+            var stdin = _videoProcess?.StandardInput;
+            if (stdin == null || _videoProcess!.HasExited)
+                throw new InvalidOperationException("Video service is not running");
+
+            await stdin.WriteLineAsync(command);
+            await stdin.FlushAsync();
+        }
     }
 
     // Updated message classes for unified communication
@@ -293,6 +327,7 @@ namespace NewwaysAdmin.WorkerAttendance.UI
         public string? Message { get; set; }
         public string? Status { get; set; }
         public double Timestamp { get; set; }
+        public int Length { get; set; } // Raw payload bytes following this line (binary frames)
         public List<PythonFace>? Faces { get; set; }
 
         // ADD these new properties: